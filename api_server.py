@@ -1,55 +1,162 @@
+import os
+import threading
+import time
+from collections import Counter
 
-from flask import Flask, jsonify, request, send_from_directory
+import numpy as np
+import orjson
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from hyperliquid.info import Info
 from hyperliquid.utils import constants
-import pandas as pd
-import json
-from datetime import datetime
-import os
 
-app = Flask(__name__, static_folder='my-app/out', static_url_path='')
+from confidence_calculator import ConfidenceCalculator
+from fills import FillStore, fetch_user_fills_raw, decode_fills, columns_to_trades
+from attribution import PERIODS, FundingCache, attribute_pnl
+from round_trips import reconstruct_round_trips, round_trips_to_trades
+from static_assets import StaticAssets
+from refresh_scheduler import RefreshScheduler
+from whale_store import MAX_REPLAY_SPAN, WhaleCollector, WhaleStore, to_ndjson
+
+# Static files are served from the StaticAssets manifest, not Flask's static route
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
-info = Info(constants.MAINNET_API_URL, skip_ws=True)
+fill_store = FillStore()
+funding_cache = FundingCache()
+static_assets = StaticAssets('my-app/out')
+whale_store = WhaleStore('whale_data')
+whale_collector = WhaleCollector(whale_store)
+calculator = ConfidenceCalculator()
+refresh_scheduler = RefreshScheduler(lambda key: build_stats(*key, tuple(PERIODS), fresh=True))
+
+_info = None
+_info_lock = threading.Lock()
+
+def process_created_at():
+    """Wall-clock creation time of this process, so interpreter start-up is counted too"""
+    try:
+        import psutil
+        return psutil.Process().create_time()
+    except ImportError:
+        pass
+    try:
+        # Field 22 of /proc/self/stat is the start time in clock ticks after boot
+        with open('/proc/self/stat') as fh:
+            started_ticks = int(fh.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as fh:
+            boot_time = next(int(line.split()[1]) for line in fh if line.startswith('btime'))
+        return boot_time + started_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        # No procfs: the best we have is when this module started loading
+        return time.time()
+
+PROCESS_CREATED_AT = process_created_at()
+
+startup = {"ready": False, "sinceProcessStartSeconds": None, "warmUpSeconds": None, "warmUpError": None}
+_background_started = False
+_background_lock = threading.Lock()
+
+def get_info():
+    """Shared SDK client, built on first use since its constructor fetches exchange metadata"""
+    global _info
+    if _info is None:
+        with _info_lock:
+            if _info is None:
+                _info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    return _info
+
+def warm_up():
+    """
+    Load the static manifest and whale history, build long-lived clients and
+    load heavy modules before the health check reports ready
+    """
+    start = time.perf_counter()
+    try:
+        static_assets.ensure_built()
+        whale_store.load()
+        get_info()
+        import pandas  # noqa: F401  (first attribution pass would otherwise pay for it)
+    except Exception as e:
+        # Not fatal: the manifest and get_info() are retried on the first request that needs them
+        print(f"Warning: warm-up failed: {e}")
+        startup["warmUpError"] = str(e)
+    startup["warmUpSeconds"] = time.perf_counter() - start
+    startup["ready"] = True
+    print(f"Warm-up finished in {startup['warmUpSeconds']:.2f}s ({time.time() - PROCESS_CREATED_AT:.2f}s since process start)")
+
+def json_response(payload, status=200):
+    """Serialize a response body with orjson, NumPy scalars and arrays included"""
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return Response(body, status=status, mimetype='application/json')
 
 @app.route('/stats')
 def stats():
     wallet = request.args.get("wallet")
     trade_type = request.args.get("type")
+    period = request.args.get("period", "day")
 
     if not wallet or trade_type not in {"perp", "spot"}:
-        return jsonify({"error": "Missing wallet or invalid type"}), 400
+        return json_response({"error": "Missing wallet or invalid type"}, 400)
+    if period not in PERIODS:
+        return json_response({"error": "Invalid period"}, 400)
+
+    # Popular wallets are served from results refreshed in the background,
+    # one result per (wallet, type) holding the payload of every period
+    key = (wallet.lower(), trade_type)
+    refresh_scheduler.record(key)
+    precomputed = refresh_scheduler.get(key)
+    if precomputed is None:
+        hot = refresh_scheduler.is_hot(key)
+        precomputed = build_stats(*key, tuple(PERIODS) if hot else (period,))
+        if hot:
+            refresh_scheduler.offer(key, *precomputed)
 
+    payloads, status = precomputed
+    return json_response(payloads[period] if status == 200 else payloads, status)
+
+def period_attribution(entry, info, wallet, spot_mode, period):
+    """
+    Fee/funding attribution for one period, cached alongside the fills it was
+    computed from; funding history lives in its own longer-lived, incrementally
+    updated cache
+    """
+    derived = entry["derived"]
+    attribution = derived.get(("attribution", period))
+    if attribution is None:
+        funding = None
+        if not spot_mode:
+            funding = funding_cache.get(info, wallet, int(entry["columns"]["time"][0]))
+        attribution = attribute_pnl(entry["columns"], funding, period)
+        derived[("attribution", period)] = attribution
+    return attribution
+
+def build_stats(wallet, trade_type, periods, fresh=False):
+    """
+    Compute the /stats payloads for a wallet from a single fill fetch. Only the
+    attribution depends on the period, so the rest is computed once and shared.
+    Returns ({period: payload}, 200), or (error payload, status) on failure.
+    fresh=True skips the fill cache, for background refreshes.
+    """
     try:
+        info = get_info()
         spot_mode = trade_type == 'spot'
         
-        # Get raw data from hyperliquid
-        fills = info.user_fills(wallet)
-        
-        print(f"DEBUG: Got {len(fills)} fills from API")
-        
-        # Filter trades based on type FIRST
-        trades = []
-        for f in fills:
-            coin = f["coin"]
-            is_spot = "/" in coin
-            if is_spot != spot_mode:
-                continue
-                
-            trades.append({
-                "time": f["time"],
-                "symbol": coin,
-                "side": "long" if "Long" in f["dir"] else "short",
-                "size": float(f["sz"]),
-                "price": float(f["px"]),
-                "pnl": float(f.get("closedPnl", 0)),
-                "fee": float(f.get("feeUsd", f.get("fee", 0))),
-                "notional": abs(float(f["sz"]) * float(f["px"]))
-            })
+        # Get raw data from hyperliquid and decode it straight into typed columns,
+        # filtering trades based on type FIRST
+        entry = None if fresh else fill_store.get((wallet.lower(), trade_type))
+        if entry is None:
+            raw_fills = fetch_user_fills_raw(info, wallet)
+            print(f"DEBUG: Got {len(raw_fills)} bytes of fills from API")
+            entry = fill_store.put((wallet.lower(), trade_type), decode_fills(raw_fills, spot_mode))
+        columns = entry["columns"]
+        # Row view for the per-fill loops below; totals are computed on the columns
+        trades = entry["derived"].get("trades")
+        if trades is None:
+            trades = entry["derived"]["trades"] = columns_to_trades(columns)
 
         if not trades:
-            return jsonify({"error": "No matching trades found"}), 404
+            return {"error": "No matching trades found"}, 404
 
         print(f"DEBUG: Found {len(trades)} trades after filtering")
         
@@ -152,19 +259,23 @@ def stats():
                     open_positions = []
                     total_unrealized_pnl = 0
 
-        # Sort by time
-        trades.sort(key=lambda x: x["time"])
-        
-        # Calculate cumulative PnL
-        cum_pnl = 0
-        pnl_chart = []
-        for i, trade in enumerate(trades):
-            cum_pnl += trade["pnl"]
-            pnl_chart.append({"timestamp": trade["time"], "pnl": cum_pnl})
+        # Calculate cumulative PnL (columns are already sorted by time), last 2000 trades
+        cum_pnl = np.cumsum(columns["pnl"])
+        pnl_chart = [{"timestamp": t, "pnl": pnl} for t, pnl in
+                     zip(columns["time"][-2000:].tolist(), cum_pnl[-2000:].tolist())]
+
+        # Group fills into round trips; win rate, averages, breakdowns and the
+        # confidence score are based on closed trades rather than fill fragments
+        round_trips = entry["derived"].get("roundTrips")
+        if round_trips is None:
+            round_trips = entry["derived"]["roundTrips"] = reconstruct_round_trips(columns)
+        closed_trades = round_trips_to_trades(round_trips)
+
+        print(f"DEBUG: Reconstructed {len(closed_trades)} closed trades from {len(trades)} fills")
 
         # Separate longs and shorts
-        longs = [t for t in trades if t["side"] == "long"]
-        shorts = [t for t in trades if t["side"] == "short"]
+        longs = [t for t in closed_trades if t["side"] == "long"]
+        shorts = [t for t in closed_trades if t["side"] == "short"]
 
         def calculate_side_stats(side_trades):
             if not side_trades:
@@ -210,31 +321,28 @@ def stats():
             }
 
         # Calculate overall stats
-        all_winners = [t for t in trades if t["pnl"] > 0]
-        all_losers = [t for t in trades if t["pnl"] < 0]
+        all_winners = [t for t in closed_trades if t["pnl"] > 0]
+        all_losers = [t for t in closed_trades if t["pnl"] < 0]
         
         # Find biggest orders, winner, loser
-        biggest_orders = sorted(trades, key=lambda x: x["notional"], reverse=True)[:5]
-        biggest_winner = max(trades, key=lambda x: x["pnl"])
-        biggest_loser = min(trades, key=lambda x: x["pnl"])
+        biggest_orders = [trades[i] for i in np.argsort(-columns["notional"], kind="stable")[:5]]
+        no_trade = {"symbol": "N/A", "pnl": 0.0}
+        biggest_winner = max(closed_trades, key=lambda x: x["pnl"]) if closed_trades else no_trade
+        biggest_loser = min(closed_trades, key=lambda x: x["pnl"]) if closed_trades else no_trade
         
         # Calculate most traded symbol
-        symbol_counts = {}
-        for t in trades:
-            symbol = t["symbol"]
-            symbol_counts[symbol] = symbol_counts.get(symbol, 0) + 1
-        most_traded = max(symbol_counts.items(), key=lambda x: x[1])[0] if symbol_counts else "N/A"
+        most_traded = Counter(columns["symbol"].tolist()).most_common(1)[0][0]
         
         # Calculate overall metrics
-        total_pnl = sum(t["pnl"] for t in trades)
-        total_volume = sum(t["notional"] for t in trades)
-        total_fees = sum(t["fee"] for t in trades)
-        win_rate = len(all_winners) / len(trades) if trades else 0.0
+        total_pnl = float(columns["pnl"].sum())
+        total_volume = float(columns["notional"].sum())
+        total_fees = float(columns["fee"].sum())
+        win_rate = len(all_winners) / len(closed_trades) if closed_trades else 0.0
         avg_win = sum(t["pnl"] for t in all_winners) / len(all_winners) if all_winners else 0.0
         avg_loss = sum(t["pnl"] for t in all_losers) / len(all_losers) if all_losers else 0.0
         avg_notional = total_volume / len(trades) if trades else 0.0
 
-        print(f"DEBUG: Calculated basic stats - Total PnL: ${total_pnl:.2f}, Win rate: {win_rate:.3f}, Trades: {len(trades)}")
+        print(f"DEBUG: Calculated basic stats - Total PnL: ${total_pnl:.2f}, Win rate: {win_rate:.3f}, Trades: {len(closed_trades)}")
 
         # Calculate position tendency (recent 100 trades)
         recent_trades = trades[-100:] if len(trades) >= 100 else trades
@@ -249,7 +357,7 @@ def stats():
 
         # Calculate time-based analysis
         def calculate_time_analysis():
-            if len(trades) < 10:
+            if len(closed_trades) < 10:
                 return {
                     "days": {day: {"trades": 0, "winRate": 0, "avgPnl": 0, "totalPnl": 0} for day in 
                             ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]},
@@ -275,8 +383,8 @@ def stats():
             
             hourly_stats = {hour: {"wins": 0, "total": 0, "pnl": 0} for hour in range(24)}
             
-            # Process each trade
-            for trade in trades:
+            # Process each closed trade
+            for trade in closed_trades:
                 dt = datetime.fromtimestamp(trade["time"] / 1000, tz=timezone.utc)
                 hour = dt.hour
                 day_name = dt.strftime("%A")
@@ -341,14 +449,24 @@ def stats():
                 "hours": {}
             }
 
+        # Funding totals are the same for every period, take them from the first one
+        try:
+            attributions = {period: period_attribution(entry, info, wallet, spot_mode, period)
+                            for period in periods}
+            total_funding = attributions[periods[0]]["totals"]["funding"]
+            net_pnl = total_pnl - total_fees + total_funding
+            attribution_error = None
+        except Exception as e:
+            # e.g. userFunding rate limits while paging a long history; report it rather than a net figure without funding
+            print(f"ERROR: Failed to calculate PnL attribution: {e}")
+            attributions = {period: {} for period in periods}
+            total_funding = net_pnl = None
+            attribution_error = str(e)
+
         # Win streaks calculation removed for now
 
-        # Import and use the new confidence calculator
-        from confidence_calculator import ConfidenceCalculator
-        
         try:
-            calculator = ConfidenceCalculator()
-            confidence_result = calculator.calculate_confidence_score(trades)
+            confidence_result = calculator.calculate_confidence_score(closed_trades, total_pnl, total_volume)
             confidence_score = confidence_result["score"]
             trader_rank = confidence_result["rank"]
             calculation_explanation = calculator.get_calculation_explanation()
@@ -360,8 +478,9 @@ def stats():
             trader_rank = {"rank": "Bronze", "color": "#cd7f32", "icon": "🥉"}
             calculation_explanation = {}
 
-        return jsonify({
-            "totalTrades": len(trades),
+        payload = {
+            "totalTrades": len(closed_trades),
+            "totalFills": len(trades),
             "winRate": win_rate,
             "avgWin": avg_win,
             "avgLoss": avg_loss,
@@ -370,6 +489,9 @@ def stats():
             "totalPnl": total_pnl + total_unrealized_pnl,
             "volume": total_volume,
             "fees": total_fees,
+            "funding": total_funding,
+            "netPnl": net_pnl,
+            "attributionError": attribution_error,
             "avgNotional": avg_notional,
             "mostTraded": most_traded,
             "positionTendency": position_tendency,
@@ -385,30 +507,112 @@ def stats():
             "biggestOrders": [{"symbol": t["symbol"], "notional": t["notional"]} for t in biggest_orders],
             "biggestWinner": {"symbol": biggest_winner["symbol"], "pnl": biggest_winner["pnl"]},
             "biggestLoser": {"symbol": biggest_loser["symbol"], "pnl": biggest_loser["pnl"]},
-            "pnlChart": pnl_chart[-2000:]  # Last 2000 trades
-        })
+            "pnlChart": pnl_chart
+        }
+        return {period: dict(payload, attribution=attributions[period]) for period in periods}, 200
 
     except Exception as e:
         print(f"ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+def whale_query_args():
+    """Shared filters of the whale endpoints; raises ValueError on bad input"""
+    coins = [c for c in request.args.get("coin", "").split(",") if c and c != "ALL"] or None
+    return {
+        "start": int(request.args.get("start", 0)),
+        "end": int(request.args["end"]) if "end" in request.args else None,
+        "coins": coins,
+        "min_notional": float(request.args.get("min", 0)),
+    }
+
+def whale_history_loading():
+    """503 response while warm-up is still loading the whale history, else None"""
+    if not whale_store.loaded.is_set():
+        return json_response({"error": "Whale history is still loading"}, 503)
+    return None
+
+@app.route('/whales')
+def whale_prints():
+    """Stored whale prints in a time range, newest first, paginated with cursor"""
+    loading = whale_history_loading()
+    if loading is not None:
+        return loading
+    try:
+        args = whale_query_args()
+        limit = max(1, min(int(request.args.get("limit", 100)), 1000))
+        cursor = request.args.get("cursor")
+        before = tuple(int(part) for part in cursor.split(":")) if cursor else None
+    except ValueError:
+        return json_response({"error": "Invalid query parameters"}, 400)
+
+    prints, next_cursor = whale_store.query(wallet=request.args.get("wallet"), limit=limit, before=before, **args)
+    return json_response({"prints": prints, "nextCursor": next_cursor})
+
+@app.route('/whales/replay')
+def whale_replay():
+    """
+    Stream stored prints oldest first as NDJSON, at speed times real time (0 = no delay).
+    end defaults to MAX_REPLAY_SPAN after start, longer windows are rejected.
+    """
+    loading = whale_history_loading()
+    if loading is not None:
+        return loading
+    try:
+        args = whale_query_args()
+        speed = float(request.args.get("speed", 1))
+    except ValueError:
+        return json_response({"error": "Invalid query parameters"}, 400)
+    if "start" not in request.args:
+        return json_response({"error": "Missing start"}, 400)
+    if args["end"] is not None and args["end"] - args["start"] > MAX_REPLAY_SPAN:
+        return json_response({"error": f"Replay window is limited to {MAX_REPLAY_SPAN // 3600000} hours"}, 400)
+
+    return Response(to_ndjson(whale_store.replay(speed=speed, **args)), mimetype='application/x-ndjson')
 
 @app.route('/api/health')
 def health_check():
-    return jsonify({"status": "healthy"})
+    # The whale collector reconnects on its own, its state is reported but doesn't gate readiness
+    if not startup["ready"]:
+        return jsonify({"status": "warming", **startup, "whaleCollector": whale_collector.status()}), 503
+    return jsonify({"status": "healthy", **startup, "whaleCollector": whale_collector.status()})
 
 @app.route('/')
 def serve_react_app():
-    return send_from_directory('my-app/out', 'index.html')
+    return static_assets.response('index.html', request)
 
 @app.route('/<path:path>')
 def serve_static_files(path):
-    try:
-        return send_from_directory('my-app/out', path)
-    except FileNotFoundError:
-        return send_from_directory('my-app/out', 'index.html')
+    return static_assets.response(path, request)
+
+def start_background_services():
+    """
+    Start warm-up, the stats refresh scheduler and the whale collector, once
+    per process. Runs on the first request a worker receives (health probes
+    included), so it works under any WSGI server without hooks and the threads
+    always start after forking; __main__ starts them up front.
+    """
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    refresh_scheduler.start()
+    threading.Thread(target=whale_collector.run, name="whale-collector", daemon=True).start()
+
+@app.before_request
+def ensure_background_services():
+    start_background_services()
+
+# Time from process creation until the app is importable (interpreter start-up plus imports)
+startup["sinceProcessStartSeconds"] = time.time() - PROCESS_CREATED_AT
+print(f"api_server loaded {startup['sinceProcessStartSeconds']:.2f}s after process start")
 
 if __name__ == '__main__':
+    start_background_services()
     print("Starting Flask app on 0.0.0.0:5000...")
     app.run(host='0.0.0.0', port=5000, debug=False)
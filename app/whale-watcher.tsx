@@ -12,11 +12,41 @@ interface WhaleTrade {
   receivedAt: number; // When we received this trade locally
 }
 
+const WHALES_URL = 'https://pnl-dna-evansmargintrad.replit.app/whales';
+
 export default function WhaleWatcher() {
   const [trades, setTrades] = useState<WhaleTrade[]>([]);
   const [connected, setConnected] = useState(false);
   const [threshold, setThreshold] = useState(50000);
   const [assetFilter, setAssetFilter] = useState('ALL');
+
+  // Seed the list with prints the backend has stored, so history survives reloads
+  useEffect(() => {
+    let cancelled = false;
+    fetch(`${WHALES_URL}?min=${threshold}&limit=50`)
+      .then(res => (res.ok ? res.json() : null))
+      .then(json => {
+        if (cancelled || !json?.prints) return;
+        const history = (json.prints as any[]).map(p => ({
+          symbol: p.symbol,
+          notional: p.notional,
+          price: p.price,
+          dir: p.dir === 'A' ? 'A' : 'B',
+          wallet: p.wallet,
+          timestamp: p.timestamp,
+          receivedAt: p.timestamp,
+        })) as WhaleTrade[];
+        setTrades(prev => {
+          const seen = new Set(prev.map(t => `${t.timestamp}-${t.wallet}`));
+          return [...prev, ...history.filter(t => !seen.has(`${t.timestamp}-${t.wallet}`))].slice(0, 50);
+        });
+      })
+      .catch(err => console.error('Whale history fetch failed', err));
+    return () => {
+      cancelled = true;
+    };
+  }, [threshold]);
+
   useEffect(() => {
     const ws = new WebSocket('wss://api.hyperliquid.xyz/ws');
 
@@ -0,0 +1,147 @@
+"""
+Fee, funding and net-of-cost PnL attribution.
+
+Fills carry gross realized PnL (closedPnl) and fees; funding payments come
+from the userFunding history. Both are stacked into one frame and reduced in a
+single grouped pass into per-symbol and per-period gross PnL, fees, funding
+and net PnL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from fills import _loads, fetch_raw
+
+# userFunding returns at most this many records per request
+FUNDING_PAGE_SIZE = 500
+
+PERIODS = {"day": "D", "week": "W", "month": "M"}
+
+
+def fetch_funding_raw(info, wallet, start_time, end_time=None):
+    """Raw bytes of one page of the userFunding response"""
+    payload = {"type": "userFunding", "user": wallet, "startTime": int(start_time)}
+    if end_time is not None:
+        payload["endTime"] = int(end_time)
+    return fetch_raw(info, payload)
+
+
+def fetch_funding(info, wallet, start_time, seen=()):
+    """
+    Funding payments since start_time as typed columns, skipping the
+    (time, coin) pairs in seen. Pages forward by time until a short page comes
+    back. Each hourly payment for every coin shares one timestamp, so the next
+    page restarts at the last timestamp and drops what was already read.
+    """
+    times, symbols, amounts = [], [], []
+    seen = set(seen)
+    while True:
+        page = _loads(fetch_funding_raw(info, wallet, start_time))
+        new = 0
+        for record in page:
+            delta = record["delta"]
+            if (record["time"], delta["coin"]) in seen:
+                continue
+            new += 1
+            times.append(record["time"])
+            symbols.append(delta["coin"])
+            amounts.append(delta["usdc"])
+        if len(page) < FUNDING_PAGE_SIZE or not new:
+            break
+        start_time = page[-1]["time"]
+        seen = {(record["time"], record["delta"]["coin"]) for record in page if record["time"] == start_time}
+
+    return {
+        "time": np.array(times, dtype=np.int64),
+        "symbol": np.array(symbols, dtype=object),
+        "funding": np.array(amounts, dtype=np.float64),
+    }
+
+
+class FundingCache:
+    """
+    Per-wallet funding history kept much longer than fills. A stale entry is
+    topped up with only the records after the last cached timestamp instead of
+    pulling the whole history again. Bounded to max_entries, LRU.
+    """
+
+    def __init__(self, refresh_after=300.0, max_entries=256):
+        self.refresh_after = refresh_after
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, info, wallet, start_time):
+        """
+        Funding columns for wallet from start_time on, complete up to at least
+        now - refresh_after. Records before start_time are kept in the cache but
+        not returned, so funding covers the same window as the fills.
+        """
+        key = wallet.lower()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        cached_start = start_time
+        if entry is not None and entry["startTime"] <= start_time:
+            if time.monotonic() - entry["fetchedAt"] <= self.refresh_after:
+                return _since(entry["columns"], start_time)
+            columns = entry["columns"]
+            if len(columns["time"]):
+                last = int(columns["time"][-1])
+                seen = {(last, coin) for coin in columns["symbol"][columns["time"] == last].tolist()}
+                update = fetch_funding(info, wallet, last, seen)
+                columns = {name: np.concatenate([columns[name], update[name]]) for name in columns}
+            else:
+                columns = fetch_funding(info, wallet, entry["startTime"])
+            cached_start = entry["startTime"]
+        else:
+            columns = fetch_funding(info, wallet, start_time)
+
+        with self._lock:
+            self._entries[key] = {"columns": columns, "startTime": cached_start, "fetchedAt": time.monotonic()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return _since(columns, start_time)
+
+
+def _since(columns, start_time):
+    """Rows of funding columns with time >= start_time"""
+    i = int(np.searchsorted(columns["time"], start_time, side="left"))
+    return columns if i == 0 else {name: values[i:] for name, values in columns.items()}
+
+
+def attribute_pnl(fill_columns, funding_columns=None, period="day"):
+    """
+    Per-symbol and per-period breakdown of gross PnL, fees, funding and net PnL
+    (gross - fees + funding, funding being positive when received).
+    """
+    # pandas is only needed here, keep it off the import path of api_server
+    import pandas as pd
+
+    if funding_columns is None:
+        funding_columns = {"time": np.empty(0, np.int64), "symbol": np.empty(0, object), "funding": np.empty(0)}
+    n_fills = len(fill_columns["time"])
+    n_funding = len(funding_columns["time"])
+
+    frame = pd.DataFrame({
+        "time": np.concatenate([fill_columns["time"], funding_columns["time"]]),
+        "symbol": np.concatenate([fill_columns["symbol"], funding_columns["symbol"]]),
+        "grossPnl": np.concatenate([fill_columns["pnl"], np.zeros(n_funding)]),
+        "fees": np.concatenate([fill_columns["fee"], np.zeros(n_funding)]),
+        "funding": np.concatenate([np.zeros(n_fills), funding_columns["funding"]]),
+    })
+    frame["period"] = pd.to_datetime(frame["time"], unit="ms").dt.to_period(PERIODS[period]).astype(str)
+
+    grouped = frame.groupby(["symbol", "period"], sort=True)[["grossPnl", "fees", "funding"]].sum()
+    grouped["netPnl"] = grouped["grossPnl"] - grouped["fees"] + grouped["funding"]
+
+    return {
+        "period": period,
+        "totals": {name: float(value) for name, value in grouped.sum().items()},
+        "bySymbol": grouped.groupby(level="symbol").sum().to_dict(orient="index"),
+        "byPeriod": grouped.groupby(level="period").sum().to_dict(orient="index"),
+    }
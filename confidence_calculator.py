@@ -59,10 +59,15 @@ class ConfidenceCalculator:
             }
         }
 
-    def calculate_confidence_score(self, trades_data):
+    def calculate_confidence_score(self, trades_data, total_pnl=None, total_volume=None):
         """
         Calculate confidence score based on recent trading performance
         Focus on: Win Rate, PnL, Risk/Reward, Volume consistency
+
+        Win rate and risk/reward come from trades_data. PnL and volume tiers use
+        total_pnl / total_volume when given (e.g. realized PnL and traded volume
+        over all fills, when trades_data are round trips), otherwise they are
+        summed over trades_data, using each trade's notional when present.
         """
         try:
             if len(trades_data) < 5:
@@ -74,8 +79,11 @@ class ConfidenceCalculator:
             trades = trades_data[-2000:] if len(trades_data) > 2000 else trades_data
 
             # Calculate base metrics
-            total_pnl = sum(t.get("pnl", 0) for t in trades)
-            total_volume = sum(abs(t.get("size", 0) * t.get("price", 0)) for t in trades)
+            if total_pnl is None:
+                total_pnl = sum(t.get("pnl", 0) for t in trades)
+            if total_volume is None:
+                total_volume = sum(t["notional"] if "notional" in t else abs(t.get("size", 0) * t.get("price", 0))
+                                   for t in trades)
             winners = [t for t in trades if t.get("pnl", 0) > 0]
             losers = [t for t in trades if t.get("pnl", 0) < 0]
 
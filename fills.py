@@ -0,0 +1,134 @@
+"""
+Fast path for Hyperliquid fill payloads.
+
+The SDK's Info.user_fills() decodes the response into a list of dicts whose
+numeric fields are still strings, so every consumer ends up calling float()
+on the same values again. Here the raw response bytes are decoded once and
+turned into typed NumPy columns in a single pass.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import orjson
+
+_loads = orjson.loads
+
+
+FILL_COLUMNS = ("time", "symbol", "side", "size", "price", "pnl", "fee", "notional")
+
+
+def _raise_for_status(info, response):
+    """
+    Raise the SDK's ClientError/ServerError for a failed response.
+    API._handle_exception is private (hyperliquid-python-sdk 0.15); if a later
+    release renames it, fall back to a plain HTTPError instead of failing on
+    the attribute lookup.
+    """
+    try:
+        handle_exception = info._handle_exception
+    except AttributeError:
+        response.raise_for_status()
+        return
+    handle_exception(response)
+
+
+def fetch_raw(info, payload):
+    """POST an /info query through the SDK's session and return the raw body bytes"""
+    response = info.session.post(info.base_url + "/info", json=payload, timeout=info.timeout)
+    _raise_for_status(info, response)
+    return response.content
+
+
+def fetch_user_fills_raw(info, wallet):
+    """Raw bytes of the userFills response for a wallet"""
+    return fetch_raw(info, {"type": "userFills", "user": wallet})
+
+
+def decode_fills(raw, spot_mode):
+    """
+    Decode a raw userFills payload into typed columns, keeping only spot or
+    only perp fills, ordered by time. Every numeric string is parsed exactly once.
+    """
+    fills = _loads(raw)
+
+    times, symbols, sides, sizes, prices, pnls, fees = [], [], [], [], [], [], []
+    buys, start_positions = [], []
+    for f in fills:
+        coin = f["coin"]
+        if ("/" in coin) != spot_mode:
+            continue
+        times.append(f["time"])
+        symbols.append(coin)
+        sides.append("long" if "Long" in f["dir"] else "short")
+        sizes.append(f["sz"])
+        prices.append(f["px"])
+        pnls.append(f.get("closedPnl", 0))
+        fees.append(f.get("feeUsd", f.get("fee", 0)))
+        buys.append(f["side"] == "B")
+        start_positions.append(f.get("startPosition", 0))
+
+    size = np.array(sizes, dtype=np.float64)
+    price = np.array(prices, dtype=np.float64)
+    columns = {
+        "time": np.array(times, dtype=np.int64),
+        "symbol": np.array(symbols, dtype=object),
+        "side": np.array(sides, dtype=object),
+        "size": size,
+        "price": price,
+        "pnl": np.array(pnls, dtype=np.float64),
+        "fee": np.array(fees, dtype=np.float64),
+        "notional": np.abs(size * price),
+        # signed position change and position before the fill, for round-trip reconstruction
+        "delta": np.where(np.array(buys, dtype=bool), size, -size),
+        "startPosition": np.array(start_positions, dtype=np.float64),
+    }
+    # userFills comes newest first
+    order = np.argsort(columns["time"], kind="stable")
+    return {name: values[order] for name, values in columns.items()}
+
+
+def columns_to_trades(columns):
+    """Row view of decoded columns, in the trade dict shape used by /stats"""
+    lists = [columns[name].tolist() for name in FILL_COLUMNS]
+    return [dict(zip(FILL_COLUMNS, row)) for row in zip(*lists)]
+
+
+class FillStore:
+    """
+    Short-lived per-wallet cache of decoded fill columns. Results derived from
+    the same fills (attribution, ...) are kept on the entry so they expire
+    together with the fills they were computed from. Bounded to max_entries,
+    least recently used first out.
+    """
+
+    def __init__(self, ttl=30.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["fetchedAt"] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, columns):
+        now = time.monotonic()
+        entry = {"columns": columns, "fetchedAt": now, "derived": {}}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            # Entries are in last-used order, so expired ones are not necessarily at the front
+            for stale in [k for k, e in self._entries.items() if now - e["fetchedAt"] > self.ttl]:
+                del self._entries[stale]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
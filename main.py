@@ -1,3 +1,5 @@
+import threading
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from hyperliquid.info import Info
@@ -8,6 +10,19 @@ from confidence_calculator import ConfidenceCalculator
 app = Flask(__name__)
 CORS(app)  # Allow cross-origin requests
 
+# Long-lived objects, built once instead of per request
+calculator = ConfidenceCalculator()
+_info = None
+_info_lock = threading.Lock()
+
+def get_info():
+    global _info
+    if _info is None:
+        with _info_lock:
+            if _info is None:
+                _info = Info(constants.MAINNET_API_URL, skip_ws=True)
+    return _info
+
 @app.route("/stats")
 def stats():
     wallet = request.args.get("wallet")
@@ -16,9 +31,8 @@ def stats():
     if not wallet or trade_type not in {"perp", "spot"}:
         return jsonify({"error": "Missing wallet or invalid type"}), 400
 
-    info = Info(constants.MAINNET_API_URL, skip_ws=True)
     rows = []
-    for f in info.user_fills(wallet):
+    for f in get_info().user_fills(wallet):
         coin = f["coin"]
         is_spot = "/" in coin
         if (trade_type == "spot") != is_spot:
@@ -42,7 +56,6 @@ def stats():
     df_sorted["cum_pnl"] = df_sorted["pnl"].cumsum()
     pnl_chart = [{"trade": i + 1, "pnl": pnl} for i, pnl in enumerate(df_sorted["cum_pnl"].tolist())]
 
-    calculator = ConfidenceCalculator()
     confidence = calculator.calculate_confidence_score(rows)
 
     longs = df[df["side"] == "long"]
@@ -0,0 +1,124 @@
+"""
+Background refresh of /stats results for popular wallets.
+
+Every request bumps an exponentially decaying popularity score for its
+(wallet, type) key. Keys above a threshold are "hot": their results are kept
+precomputed and refreshed by a single background thread, hottest first, at a
+rate-limited pace so upstream traffic stays bounded. Keys whose refresh fails
+are retried with exponential backoff. Cold keys are never stored and are still
+computed on demand by the request handler.
+"""
+import heapq
+import threading
+import time
+
+
+class RefreshScheduler:
+    def __init__(self, compute, min_score=3.0, half_life=3600.0, refresh_interval=60.0,
+                 max_age=180.0, refreshes_per_second=0.5, max_hot=None, max_backoff=1800.0):
+        """
+        compute(key) returns a (payload, status) tuple with freshly fetched data.
+        Results are refreshed every refresh_interval seconds and served while
+        younger than max_age. By default max_hot is as many keys as can be
+        refreshed within max_age, so no hot result expires before its turn.
+        """
+        self.compute = compute
+        self.min_score = min_score
+        self.half_life = half_life
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.min_gap = 1.0 / refreshes_per_second
+        self.max_hot = max_hot if max_hot is not None else max(1, int(refreshes_per_second * max_age))
+        self.max_backoff = max_backoff
+
+        self._scores = {}    # key -> (score, last_seen)
+        self._results = {}   # key -> (payload, status, computed_at)
+        self._failures = {}  # key -> (consecutive failures, failed_at)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _score(self, key, now):
+        score, last_seen = self._scores.get(key, (0.0, now))
+        return score * 0.5 ** ((now - last_seen) / self.half_life)
+
+    def record(self, key):
+        """Count one request for key"""
+        now = time.monotonic()
+        with self._lock:
+            self._scores[key] = (self._score(key, now) + 1.0, now)
+
+    def get(self, key):
+        """Precomputed (payload, status) for key, or None if missing or too old"""
+        with self._lock:
+            result = self._results.get(key)
+        if result is None or time.monotonic() - result[2] > self.max_age:
+            return None
+        return result[0], result[1]
+
+    def is_hot(self, key):
+        with self._lock:
+            return self._score(key, time.monotonic()) >= self.min_score
+
+    def offer(self, key, payload, status):
+        """Keep an on-demand result if key is hot, so the next request is served from it"""
+        if status != 200:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._score(key, now) >= self.min_score:
+                self._results[key] = (payload, status, now)
+
+    def _next_due(self):
+        """
+        Hottest of the max_hot hottest keys whose result is stale and that is not
+        backing off after a failure; also forgets keys that cooled down
+        """
+        now = time.monotonic()
+        with self._lock:
+            scored = [(self._score(key, now), key) for key in self._scores]
+            for score, key in scored:
+                if score < self.min_score:
+                    self._results.pop(key, None)
+                    self._failures.pop(key, None)
+                    if score < 0.01:
+                        del self._scores[key]
+            hot = heapq.nlargest(self.max_hot, (item for item in scored if item[0] >= self.min_score),
+                                 key=lambda item: item[0])
+            for _, key in hot:
+                result = self._results.get(key)
+                if result is not None and now - result[2] < self.refresh_interval:
+                    continue
+                failure = self._failures.get(key)
+                if failure is not None and now - failure[1] < self._backoff(failure[0]):
+                    continue
+                return key
+        return None
+
+    def _backoff(self, failures):
+        return min(self.max_backoff, self.refresh_interval * 2 ** (failures - 1))
+
+    def _run(self):
+        # Re-pick after every refresh, so keys that heat up meanwhile get their turn
+        while True:
+            started = time.monotonic()
+            key = self._next_due()
+            if key is not None:
+                try:
+                    payload, status = self.compute(key)
+                except Exception as e:
+                    payload, status = {"error": str(e)}, 500
+                with self._lock:
+                    if status == 200:
+                        self._results[key] = (payload, status, time.monotonic())
+                        self._failures.pop(key, None)
+                    else:
+                        failures = self._failures.get(key, (0, 0.0))[0] + 1
+                        self._failures[key] = (failures, time.monotonic())
+                        print(f"Warning: background refresh of {key} failed ({status}: {payload.get('error')}), "
+                              f"retrying in {self._backoff(failures):.0f}s")
+            time.sleep(max(0.0, self.min_gap - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="refresh-scheduler", daemon=True)
+            self._thread.start()
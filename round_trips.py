@@ -0,0 +1,132 @@
+"""
+Round-trip trade reconstruction.
+
+Fills are grouped per symbol into positions that run from flat, through
+scale-ins and partial closes, back to flat. Each closed position becomes one
+trade with its holding time, volume-weighted entry/exit prices and PnL. This
+is what win rate, average win/loss and the confidence score should be based
+on, rather than individual fill fragments.
+"""
+import numpy as np
+
+from fills import FILL_COLUMNS
+
+# Positions smaller than this are treated as flat (float accumulation noise)
+FLAT_EPSILON = 1e-9
+
+ROUND_TRIP_COLUMNS = FILL_COLUMNS + ("openTime", "exitPrice", "holdingMs", "fills")
+
+
+class _Position:
+    """Running state of one open position while scanning fills"""
+
+    __slots__ = ("sign", "size", "open_time", "entry_qty", "entry_cost", "exit_qty", "exit_cost",
+                 "max_size", "pnl", "fee", "notional", "fills", "orphan")
+
+    def __init__(self, sign, open_time, orphan=False):
+        self.sign = sign
+        self.size = 0.0
+        self.open_time = open_time
+        self.entry_qty = self.entry_cost = 0.0
+        self.exit_qty = self.exit_cost = 0.0
+        self.max_size = 0.0
+        self.pnl = self.fee = self.notional = 0.0
+        self.fills = 0
+        self.orphan = orphan
+
+    def add(self, qty, px, pnl, fee):
+        """Open or scale in"""
+        self.size += self.sign * qty
+        self.entry_qty += qty
+        self.entry_cost += qty * px
+        self.max_size = max(self.max_size, abs(self.size))
+        self.pnl += pnl
+        self.fee += fee
+        self.notional += qty * px
+        self.fills += 1
+
+    def reduce(self, qty, px, pnl, fee):
+        """Partial or full close"""
+        self.size -= self.sign * qty
+        self.exit_qty += qty
+        self.exit_cost += qty * px
+        self.pnl += pnl
+        self.fee += fee
+        self.notional += qty * px
+        self.fills += 1
+
+
+def reconstruct_round_trips(columns):
+    """
+    Single linear pass over time-ordered fill columns with per-symbol position
+    state. Returns closed round trips as columns sorted by close time.
+
+    Positions already open before the first fill in the history window have
+    no known entry, so they are tracked to flat but not emitted as trades.
+    A fill that flips the position closes the current trade and opens the
+    next one with the remaining size; its fee is split pro rata.
+    """
+    order = np.argsort(columns["time"], kind="stable")
+    times = columns["time"][order].tolist()
+    symbols = columns["symbol"][order].tolist()
+    prices = columns["price"][order].tolist()
+    deltas = columns["delta"][order].tolist()
+    pnls = columns["pnl"][order].tolist()
+    fees = columns["fee"][order].tolist()
+    start_positions = columns["startPosition"][order].tolist()
+
+    open_positions = {}
+    closed = []
+
+    for t, symbol, px, delta, pnl, fee, start in zip(times, symbols, prices, deltas, pnls, fees, start_positions):
+        if symbol not in open_positions:
+            pos = None
+            if abs(start) > FLAT_EPSILON:
+                pos = _Position(1 if start > 0 else -1, t, orphan=True)
+                pos.size = start
+            open_positions[symbol] = pos
+
+        pos = open_positions[symbol]
+        qty = abs(delta)
+        if qty <= FLAT_EPSILON:
+            continue
+        sign = 1 if delta > 0 else -1
+
+        if pos is None or sign == pos.sign:
+            if pos is None:
+                pos = open_positions[symbol] = _Position(sign, t)
+            pos.add(qty, px, pnl, fee)
+            continue
+
+        close_qty = min(qty, abs(pos.size))
+        close_fee = fee * close_qty / qty
+        pos.reduce(close_qty, px, pnl, close_fee)
+        if abs(pos.size) > FLAT_EPSILON:
+            continue
+
+        if not pos.orphan:
+            closed.append((
+                t, symbol, "long" if pos.sign > 0 else "short", pos.max_size, pos.entry_cost / pos.entry_qty, pos.pnl, pos.fee,
+                pos.notional, pos.open_time, pos.exit_cost / pos.exit_qty, t - pos.open_time, pos.fills,
+            ))
+        open_positions[symbol] = None
+
+        # A flip opens the next position with whatever size is left over
+        remaining = qty - close_qty
+        if remaining > FLAT_EPSILON:
+            pos = open_positions[symbol] = _Position(sign, t)
+            pos.add(remaining, px, 0.0, fee - close_fee)
+
+    rows = list(zip(*closed)) if closed else [[] for _ in ROUND_TRIP_COLUMNS]
+    dtypes = (np.int64, object, object, np.float64, np.float64, np.float64, np.float64,
+              np.float64, np.int64, np.float64, np.int64, np.int64)
+    return {name: np.array(values, dtype=dtype) for name, values, dtype in zip(ROUND_TRIP_COLUMNS, rows, dtypes)}
+
+
+def round_trips_to_trades(round_trips):
+    """
+    Row view of round-trip columns in the trade dict shape used by /stats and
+    ConfidenceCalculator: time is the close time, price the average entry.
+    """
+    lists = [round_trips[name].tolist() for name in ROUND_TRIP_COLUMNS]
+    return [dict(zip(ROUND_TRIP_COLUMNS, row)) for row in zip(*lists)]
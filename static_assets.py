@@ -0,0 +1,149 @@
+"""
+In-memory static file layer for the exported Next.js bundle.
+
+During warm-up (or on the first static request, whichever comes first) the
+export directory is walked once into a manifest of URL path -> asset. Small files are kept in memory together with gzip (and brotli, when the
+brotli package is installed) variants, so asset requests never touch the
+filesystem. Larger files are streamed with send_file. Hashed build output under
+_next/static/ is served with long-lived immutable cache headers, and unknown
+paths fall back to index.html by manifest lookup.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import Response, send_file
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip variants are always built
+    brotli = None
+
+# Files up to this size are held in memory, bigger ones are streamed from disk
+MAX_MEMORY_SIZE = 1024 * 1024
+# Don't bother compressing files smaller than this
+MIN_COMPRESS_SIZE = 1024
+# Levels for variants compressed at startup when the build didn't ship .gz/.br files;
+# the maximum levels cost several times the CPU for a few percent smaller output
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml",
+                      "application/xml", "application/manifest+json")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Each encoded body gets its own strong ETag: "<hash>" for identity, "<hash>-gz" for gzip, ...
+ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+class StaticAssets:
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.manifest = {}
+        self._built = False
+        self._build_lock = threading.Lock()
+
+    def ensure_built(self):
+        """Build the manifest once, on first use"""
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self.build()
+                    self._built = True
+
+    def build(self):
+        """Walk the export directory and (re)build the manifest"""
+        manifest = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.endswith((".gz", ".br")):
+                        continue
+                    full_path = os.path.join(dirpath, filename)
+                    url_path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                    manifest[url_path] = self._load(full_path, url_path)
+        self.manifest = manifest
+        print(f"Static manifest: {len(manifest)} files from {self.root}")
+
+    def _load(self, full_path, url_path):
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        stat = os.stat(full_path)
+        asset = {
+            "path": full_path,
+            "contentType": content_type,
+            "size": stat.st_size,
+            "cacheControl": IMMUTABLE_CACHE if url_path.startswith("_next/static/") else REVALIDATE_CACHE,
+            "body": None,
+            "variants": {},
+        }
+
+        if stat.st_size > MAX_MEMORY_SIZE:
+            asset["etag"] = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+            return asset
+
+        with open(full_path, "rb") as fh:
+            body = fh.read()
+        asset["body"] = body
+        asset["etag"] = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+        if len(body) >= MIN_COMPRESS_SIZE and content_type.startswith(COMPRESSIBLE_TYPES):
+            # Prefer variants produced by the build, compress in memory otherwise
+            compressors = (("br", ".br", brotli and (lambda data: brotli.compress(data, quality=BROTLI_QUALITY))),
+                           ("gzip", ".gz", lambda data: gzip.compress(data, GZIP_LEVEL)))
+            for encoding, ext, compress in compressors:
+                if os.path.isfile(full_path + ext):
+                    with open(full_path + ext, "rb") as fh:
+                        variant = fh.read()
+                elif compress:
+                    variant = compress(body)
+                else:
+                    continue
+                asset["variants"][encoding] = {
+                    "body": variant,
+                    "etag": asset["etag"][:-1] + ETAG_SUFFIXES[encoding] + '"',
+                }
+        return asset
+
+    def resolve(self, path):
+        """Manifest lookup with Next.js export conventions and SPA fallback to index.html"""
+        path = path.strip("/")
+        for candidate in (path, f"{path}.html", f"{path}/index.html" if path else "index.html"):
+            if candidate in self.manifest:
+                return self.manifest[candidate]
+        # Missing hashed assets are real 404s, everything else is a client-side route
+        if path.startswith("_next/"):
+            return None
+        return self.manifest.get("index.html")
+
+    def response(self, path, request):
+        self.ensure_built()
+        asset = self.resolve(path)
+        if asset is None:
+            return Response("Not found", status=404, mimetype="text/plain")
+
+        if asset["body"] is None:
+            # send_file answers If-None-Match / Range itself when given the ETag
+            response = send_file(asset["path"], mimetype=asset["contentType"], conditional=True,
+                                 etag=asset["etag"].strip('"'))
+            response.headers["Cache-Control"] = asset["cacheControl"]
+            return response
+
+        body, etag = asset["body"], asset["etag"]
+        headers = {"Cache-Control": asset["cacheControl"]}
+        if asset["variants"]:
+            headers["Vary"] = "Accept-Encoding"
+            # Quality-aware, so "gzip;q=0" is a refusal; br wins ties
+            encoding = request.accept_encodings.best_match(list(asset["variants"]))
+            if encoding:
+                body, etag = asset["variants"][encoding]["body"], asset["variants"][encoding]["etag"]
+                headers["Content-Encoding"] = encoding
+        headers["ETag"] = etag
+
+        if request.if_none_match.contains_weak(etag.strip('"')):
+            return Response(status=304, headers=headers)
+
+        return Response(body, mimetype=asset["contentType"], headers=headers)
@@ -0,0 +1,428 @@
+"""
+Persistent store of whale prints for history and replay.
+
+Prints are appended to time-partitioned JSON-lines files, one per UTC day and
+coin (whale_data/2026-01-31/BTC.jsonl), and never rewritten. During warm-up the
+partitions inside the retention window are loaded into two in-memory indexes:
+
+  - per coin and notional tier: parallel lists of (time, tid) keys and records,
+    sorted by time, holding the prints at or above the tier
+  - per wallet: the same structure over every print the wallet took part in
+
+Range queries read from the highest tier at or below the requested threshold,
+bisect straight to the requested window and copy it out a page at a time from
+its newest end. A query only touches about the prints it returns, never the
+whole history. The lock is held only while copying a page, so queries never
+hold up the collector.
+
+Only one process collects: WhaleCollector takes an flock on whale_data/.collector.lock.
+Every other process tails the partition files from the offsets it has read
+so far, which keeps its indexes current without a websocket of its own.
+"""
+import os
+import shutil
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where every process collects for itself
+    fcntl = None
+
+_loads, _dumps = orjson.loads, orjson.dumps
+
+DEFAULT_COINS = ("BTC", "ETH", "SOL", "HYPE")
+# Smallest print worth keeping, matches the bottom of the whale watcher slider
+MIN_NOTIONAL = 50_000
+# Per-coin indexes are kept for each of these thresholds
+NOTIONAL_TIERS = (MIN_NOTIONAL, 100_000, 250_000, 500_000, 1_000_000)
+# Longest pause between two replayed prints, in seconds
+MAX_REPLAY_GAP = 5.0
+# Lock file in the store root held by the one collecting process
+COLLECTOR_LOCK = ".collector.lock"
+# Longest window a replay may cover (ms), and longest it may stream for (s)
+MAX_REPLAY_SPAN = 6 * 3600 * 1000
+MAX_REPLAY_SECONDS = 900.0
+
+
+def _day(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class _Index:
+    """Time-ordered (time, tid) keys with their records"""
+
+    __slots__ = ("keys", "records")
+
+    def __init__(self):
+        self.keys = []
+        self.records = []
+
+    def insert(self, key, record):
+        """Append (or insert if out of order); returns False for a duplicate key"""
+        if not self.keys or key > self.keys[-1]:
+            self.keys.append(key)
+            self.records.append(record)
+            return True
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return False
+        self.keys.insert(i, key)
+        self.records.insert(i, record)
+        return True
+
+    def drop_before(self, ms):
+        i = bisect_left(self.keys, (ms,))
+        if i:
+            del self.keys[:i]
+            del self.records[:i]
+
+    def newest_page(self, start, end, before, size):
+        """Copy of the (up to) size newest (key, record) pairs with start <= time <= end and key < before"""
+        lo = bisect_left(self.keys, (start,))
+        hi = bisect_right(self.keys, (end, float("inf")))
+        if before is not None:
+            hi = min(hi, bisect_left(self.keys, before))
+        lo = max(lo, hi - size)
+        return list(zip(self.keys[lo:hi], self.records[lo:hi]))
+
+    def oldest_page(self, after, end, size):
+        """Copy of the (up to) size oldest (key, record) pairs with key > after and time <= end"""
+        lo = bisect_right(self.keys, after)
+        hi = min(bisect_right(self.keys, (end, float("inf"))), lo + size)
+        return list(zip(self.keys[lo:hi], self.records[lo:hi]))
+
+
+def _tier(min_notional):
+    """Position in NOTIONAL_TIERS of the highest tier at or below min_notional"""
+    return max(0, bisect_right(NOTIONAL_TIERS, min_notional) - 1)
+
+
+class WhaleStore:
+    def __init__(self, root="whale_data", retention_days=31):
+        self.root = root
+        self.retention_days = retention_days
+        self.by_coin = {}
+        self.by_wallet = {}
+        self._files = {}
+        self._offsets = {}  # partition path -> bytes already indexed
+        self._lock = threading.Lock()
+        self._current_day = None
+        self.loaded = threading.Event()
+
+    def _cutoff(self):
+        return int((time.time() - self.retention_days * 86400) * 1000)
+
+    def _days(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(day for day in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, day)))
+
+    def load(self):
+        """Build the in-memory indexes from the partitions inside the retention window"""
+        try:
+            count = self.tail()
+            print(f"Whale store: loaded {count} prints from {self.root}")
+        finally:
+            # Serve whatever was loaded rather than nothing at all
+            self.loaded.set()
+
+    def tail(self):
+        """
+        Index what was appended to the partitions since the last call (all of
+        them on the first one); returns the number of new prints. Processes
+        that don't collect call this to follow the collector's writes.
+        """
+        today = _day(time.time() * 1000)
+        if self._current_day is None or today > self._current_day:
+            with self._lock:
+                self._roll_day(today)
+        oldest_day = _day(self._cutoff())
+        count = 0
+        for day in self._days():
+            if day < oldest_day:
+                continue
+            day_dir = os.path.join(self.root, day)
+            for filename in os.listdir(day_dir):
+                path = os.path.join(day_dir, filename)
+                offset = self._offsets.get(path, 0)
+                if os.path.getsize(path) <= offset:
+                    continue
+                with open(path, "rb") as fh:
+                    fh.seek(offset)
+                    data = fh.read()
+                # Leave a partly written last line for the next call
+                data = data[:data.rfind(b"\n") + 1]
+                self._offsets[path] = offset + len(data)
+                records = []
+                for line in data.splitlines():
+                    try:
+                        records.append(_loads(line))
+                    except ValueError:
+                        continue  # torn write left behind by a crash
+                with self._lock:
+                    count += sum(self._index(record) for record in records)
+        return count
+
+    def _index(self, record):
+        key = (record["timestamp"], record["tid"])
+        tiers = self.by_coin.setdefault(record["symbol"], [_Index() for _ in NOTIONAL_TIERS])
+        if not tiers[0].insert(key, record):
+            return 0
+        for threshold, index in zip(NOTIONAL_TIERS[1:], tiers[1:]):
+            if record["notional"] < threshold:
+                break
+            index.insert(key, record)
+        for wallet in {record["wallet"], record.get("counterparty")} - {None}:
+            self.by_wallet.setdefault(wallet.lower(), _Index()).insert(key, record)
+        return 1
+
+    def _partition(self, day, coin):
+        fh = self._files.get((day, coin))
+        if fh is None:
+            os.makedirs(os.path.join(self.root, day), exist_ok=True)
+            fh = self._files[(day, coin)] = open(os.path.join(self.root, day, f"{coin}.jsonl"), "ab")
+        return fh
+
+    def _roll_day(self, day):
+        """Move on to a new day: close older partition files and drop prints past the retention window"""
+        for fh in self._files.values():
+            fh.close()
+        self._files = {}
+        self._current_day = day
+        cutoff = self._cutoff()
+        for index in [i for tiers in self.by_coin.values() for i in tiers] + list(self.by_wallet.values()):
+            index.drop_before(cutoff)
+        self.by_wallet = {wallet: index for wallet, index in self.by_wallet.items() if index.keys}
+        oldest_day = _day(cutoff)
+        for old in self._days():
+            if old < oldest_day:
+                old_dir = os.path.join(self.root, old)
+                self._offsets = {path: n for path, n in self._offsets.items()
+                                 if not path.startswith(old_dir + os.sep)}
+                shutil.rmtree(old_dir, ignore_errors=True)
+
+    def add(self, trade):
+        """Store one websocket trade if it is big enough; returns the record or None"""
+        notional = float(trade["sz"]) * float(trade["px"])
+        if notional < MIN_NOTIONAL:
+            return None
+        users = trade.get("users") or ["unknown"]
+        record = {
+            "symbol": trade["coin"],
+            "notional": notional,
+            "price": float(trade["px"]),
+            "dir": "A" if trade["side"] == "A" else "B",
+            "wallet": users[0],
+            "counterparty": users[1] if len(users) > 1 else None,
+            "timestamp": trade["time"],
+            "tid": trade["tid"],
+        }
+        day = _day(record["timestamp"])
+        with self._lock:
+            # Only roll forward: around midnight the coin feeds interleave, and a late
+            # print from yesterday just goes to yesterday's partition
+            if self._current_day is None or day > self._current_day:
+                self._roll_day(day)
+            if not self._index(record):
+                return None
+            fh = self._partition(day, record["symbol"])
+            fh.write(_dumps(record) + b"\n")
+            fh.flush()
+        return record
+
+    def _sources(self, coins, wallet, min_notional):
+        """Indexes to read for a query; call with the lock held"""
+        if wallet is not None:
+            index = self.by_wallet.get(wallet.lower())
+            return [index] if index else []
+        tier = _tier(min_notional)
+        return [self.by_coin[c][tier] for c in (coins or self.by_coin) if c in self.by_coin]
+
+    def query(self, start=0, end=None, coins=None, wallet=None, min_notional=0, limit=100, before=None):
+        """
+        Prints in [start, end], newest first, at most limit of them. Pass the
+        returned cursor back as before to get the next (older) page.
+        """
+        end = end if end is not None else int(time.time() * 1000)
+        page_size = max(limit, 200)
+        prints = []
+        while True:
+            # Copy the newest page_size candidates of every source under the lock and
+            # merge outside it. The page_size newest of the union are then complete:
+            # anything not copied is older than a whole page of its own source.
+            with self._lock:
+                chunk = [item for source in self._sources(coins, wallet, min_notional)
+                         for item in source.newest_page(start, end, before, page_size)]
+            if not chunk:
+                return prints, None
+            chunk.sort(key=lambda item: item[0], reverse=True)
+            chunk = chunk[:page_size]
+            for key, record in chunk:
+                if record["notional"] < min_notional or (coins and record["symbol"] not in coins):
+                    continue
+                prints.append(record)
+                if len(prints) == limit:
+                    return prints, f"{key[0]}:{key[1]}"
+            before = chunk[-1][0]
+
+    def replay(self, start, end=None, coins=None, min_notional=0, speed=1.0, page_size=500,
+               max_seconds=MAX_REPLAY_SECONDS):
+        """
+        Yield prints oldest first, sleeping between them to reproduce the
+        original spacing divided by speed (speed <= 0 disables the delays).
+        Gaps are capped at MAX_REPLAY_GAP seconds so quiet hours don't stall.
+        The window is cut at MAX_REPLAY_SPAN after start, and the stream ends
+        after max_seconds of wall time.
+        """
+        end = min(end if end is not None else int(time.time() * 1000), start + MAX_REPLAY_SPAN)
+        deadline = time.monotonic() + max_seconds
+        after = (start - 1, float("inf"))  # exclusive lower bound on (time, tid)
+        previous = None
+        while True:
+            # Take the next page_size keys after the cursor from every coin under the lock,
+            # then sleep and yield without holding it
+            with self._lock:
+                chunk = [item for source in self._sources(coins, None, min_notional)
+                         for item in source.oldest_page(after, end, page_size)]
+            if not chunk:
+                return
+            chunk.sort(key=lambda item: item[0])
+            chunk = chunk[:page_size]
+            for key, record in chunk:
+                if record["notional"] < min_notional:
+                    continue
+                if previous is not None and speed > 0:
+                    delay = min(MAX_REPLAY_GAP, (key[0] - previous) / 1000 / speed)
+                    if time.monotonic() + delay > deadline:
+                        return
+                    time.sleep(delay)
+                previous = key[0]
+                yield record
+            after = chunk[-1][0]
+
+
+def to_ndjson(records):
+    """Encode an iterable of prints as newline-delimited JSON chunks"""
+    for record in records:
+        yield _dumps(record) + b"\n"
+
+
+class WhaleCollector:
+    """
+    Keeps a trades subscription for coins open and persists every whale print.
+    The SDK's WebsocketManager runs a single run_forever() with no reconnect,
+    so each connection is watched here: once its thread exits, or no trade
+    arrives for stale_after seconds, it is closed and replaced after a backoff
+    (doubling up to max_backoff), subscribing again on the new connection.
+
+    Of all processes sharing the store root only the one holding the collector
+    lock connects; the others follow its writes with store.tail() every
+    follow_interval seconds, and take over if the collector process exits.
+    """
+
+    def __init__(self, store, coins=DEFAULT_COINS, stale_after=120.0, max_backoff=60.0, follow_interval=5.0):
+        self.store = store
+        self.coins = coins
+        self.stale_after = stale_after
+        self.max_backoff = max_backoff
+        self.follow_interval = follow_interval
+        self.role = None
+        self._lock_file = None
+        self.connected = False
+        self.connected_at = None
+        self.last_message_at = None
+        self.reconnects = 0
+        self.last_error = None
+
+    def status(self):
+        """Liveness summary for the health check"""
+        return {
+            "role": self.role,
+            "connected": self.connected,
+            "connectedAt": self.connected_at,
+            "lastMessageAt": self.last_message_at,
+            "reconnects": self.reconnects,
+            "lastError": self.last_error,
+        }
+
+    def _on_trades(self, msg):
+        self.last_message_at = time.time()
+        for trade in msg.get("data", []):
+            try:
+                self.store.add(trade)
+            except Exception as e:
+                print(f"Warning: could not store whale print: {e}")
+
+    def _watch(self):
+        """Run one connection until it drops or goes quiet"""
+        from hyperliquid.utils import constants
+        from hyperliquid.websocket_manager import WebsocketManager
+
+        manager = WebsocketManager(constants.MAINNET_API_URL)
+        try:
+            manager.start()
+            for coin in self.coins:
+                manager.subscribe({"type": "trades", "coin": coin}, self._on_trades)
+            opened = time.time()
+            print(f"Whale collector subscribed to {', '.join(self.coins)}")
+            while manager.is_alive():
+                self.connected = manager.ws_ready
+                if self.connected and self.connected_at is None:
+                    self.connected_at = time.time()
+                if time.time() - max(opened, self.last_message_at or 0) > self.stale_after:
+                    self.last_error = f"no trades for {self.stale_after:.0f}s"
+                    return
+                time.sleep(1.0)
+            self.last_error = "connection closed"
+        finally:
+            self.connected = False
+            self.connected_at = None
+            try:
+                manager.stop()
+            except Exception:
+                pass
+
+    def _take_lock(self):
+        """True once this process holds the collector lock (always, without fcntl)"""
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            os.makedirs(self.store.root, exist_ok=True)
+            self._lock_file = open(os.path.join(self.store.root, COLLECTOR_LOCK), "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def run(self):
+        """Follow or collect forever, reconnecting with backoff; meant for a daemon thread"""
+        self.store.loaded.wait()
+        while not self._take_lock():
+            self.role = "follower"
+            try:
+                self.store.tail()
+            except Exception as e:
+                print(f"Warning: could not follow whale prints: {e}")
+            time.sleep(self.follow_interval)
+        self.role = "collector"
+        self.store.tail()  # whatever the previous collector wrote after our last tail
+        backoff = 1.0
+        while True:
+            started = time.time()
+            try:
+                self._watch()
+            except Exception as e:
+                self.last_error = str(e)
+            # A connection that delivered trades was healthy, start the backoff over
+            if self.last_message_at is not None and self.last_message_at > started:
+                backoff = 1.0
+            print(f"Whale collector disconnected ({self.last_error}), reconnecting in {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(self.max_backoff, backoff * 2)
+            self.reconnects += 1